@@ -0,0 +1,111 @@
+import atexit
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+# set by start(): the archive this run's responses go to, or the responses it replays instead of fetching
+recorder = None
+replayer = None
+
+
+def request_key(method, url, body):
+    return json.dumps([method, url, body], sort_keys=True)
+
+
+def read_archive(path):
+    # An archive cut short by a run that died is gzip without its trailer, which is still good up to there.
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.endswith('\n'):
+                    yield json.loads(line)
+        except EOFError:
+            return
+
+
+def listing(directory, source):
+    # the source's archives, oldest first, as their names sort by time
+    return sorted(name for name in os.listdir(directory)
+                  if name.startswith(source + '-') and name.endswith('.jsonl.gz'))
+
+
+def is_full(path):
+    return path.endswith('-full.jsonl.gz')
+
+
+def rebuild_from(archives):
+    # the newest full crawl, or None if there isn't one
+    fulls = [name for name in archives if is_full(name)]
+    return fulls[-1] if len(fulls) > 0 else None
+
+
+def chain(directory, source):
+    # The archives a rebuild replays, in order: the newest full crawl and every run after it. Each is
+    # replayed as its own run, so an incremental one carries on from where the run before it left off.
+    # Without a full crawl there's nothing for the incremental runs to carry on from, so nothing to replay.
+    archives = listing(directory, source)
+    start = rebuild_from(archives)
+    if start is None:
+        return []
+    return [os.path.join(directory, name) for name in archives if name >= start]
+
+
+class Archive:
+    # Appends each response a run receives to <directory>/<source>-<time>[-full].jsonl.gz, as one JSON object
+    # a line. The newest `keep` archives of the source are kept, and so is the newest archive of a full crawl
+    # and every one after it, since those are what a rebuild replays.
+    def __init__(self, directory, source, keep, full):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{source}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+                                            f"{'-full' if full else ''}.jsonl.gz")
+        self.lock = threading.Lock()
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+        # until there's a full crawl, none of them are
+        archives = listing(directory, source)
+        start = rebuild_from(archives)
+        for name in archives[:-keep]:
+            if start is not None and name < start:
+                os.remove(os.path.join(directory, name))
+
+    def record(self, method, url, body, data):
+        line = json.dumps({'method': method, 'url': url, 'body': body, 'data': data}, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + '\n')
+            # a sync flush, so the archive is readable up to here if the run dies
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class Replay:
+    # The responses in one archive, by request. Archives are never merged: each is one crawl, and pages
+    # from different crawls wouldn't add up to any state the API was ever in.
+    def __init__(self, path):
+        self.responses = {}
+        for record in read_archive(path):
+            self.responses[request_key(record['method'], record['url'], record['body'])] = record['data']
+
+    def response(self, method, url, body):
+        # KeyError if the archive doesn't have it
+        return self.responses[request_key(method, url, body)]
+
+
+def add_arguments(parser):
+    parser.add_argument('--archive', metavar='DIR', default=os.environ.get('ARCHIVE_DIR'),
+                        help='append the responses received to a new archive in this directory')
+    parser.add_argument('--replay', metavar='PATH',
+                        help='ingest the responses in this archive instead of fetching them, as a full or '
+                             'incremental run like the one that recorded it')
+
+
+def start(args, source, full=False):
+    global recorder, replayer
+    if args.replay:
+        replayer = Replay(args.replay)
+    elif args.archive is not None:
+        recorder = Archive(args.archive, source, int(os.environ.get('ARCHIVE_KEEP', '10')), full)
+        atexit.register(recorder.close)
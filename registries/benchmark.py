@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import PurePosixPath
+from urllib.parse import urlparse, parse_qs
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# roughly the size of each catalogue at 1x
+ONS_ITEMS = 2500
+WHITEHALL_RESULTS = 1000
+WHITEHALL_PAGE = 20
+ORGANISATIONS = 300
+SHEETS = 40
+SHEET_ROWS = 50
+# searched for once each fetcher has finished
+SEARCHES = ['gross domestic product', 'population estimates', 'labour market', 'trade', 'health']
+
+
+class Catalogue:
+    # Synthetic API responses and spreadsheet, scaled up from either built-in templates or pages recorded
+    # from the real APIs.
+    def __init__(self, scale, recorded=None, seed=0):
+        rnd = random.Random(seed)
+        ons_templates = [{'uri': '/economy/grossdomesticproductgdp/datasets/quarterlyaccounts/current',
+                          'description': {'title': 'Quarterly accounts', 'summary': 'A summary.',
+                                          'keywords': ['gdp, national accounts, output'],
+                                          'nationalStatistic': True, 'versionLabel': '1', 'edition': 'current',
+                                          'nextRelease': '30 June 2021',
+                                          'contact': {'name': 'National accounts', 'email': 'na@ons.gov.uk',
+                                                      'telephone': '+44 1633 456 000'}}}]
+        whitehall_templates = [{'title': 'Statistics on statistics', 'display_type': 'Official Statistics',
+                                'government_name': '2019 Conservative government'}]
+        labels = [f'Department for {rnd.choice(["Statistics", "Data", "Numbers", "Surveys"])} {n}'
+                  for n in range(ORGANISATIONS * scale)]
+        if recorded is not None:
+            with open(os.path.join(recorded, 'ons.json')) as f:
+                ons_templates = json.load(f)['items']
+            with open(os.path.join(recorded, 'whitehall.json')) as f:
+                whitehall_templates = [result['result'] for result in json.load(f)['results']]
+            with open(os.path.join(recorded, 'sparql.json')) as f:
+                labels = [binding['label']['value'] for binding in json.load(f)['results']['bindings']]
+        self.orgs = {label: f'http://gss-data.org.uk/def/organisation/{n}' for n, label in enumerate(labels)}
+
+        newest = datetime(2021, 6, 1, 9, 30, tzinfo=timezone.utc)
+        self.ons_items = []
+        for n in range(ONS_ITEMS * scale):
+            template = ons_templates[n % len(ons_templates)]
+            path = PurePosixPath(template['uri'])
+            # a few releases of each dataset, listed newest first as the API does
+            item = dict(template, uri=str(path.parent.with_name(f'{path.parent.name}{n // 3}') / f'{path.name}{n}'))
+            item['description'] = dict(template['description'],
+                                       releaseDate=(newest - timedelta(hours=n)).isoformat().replace('+00:00', 'Z'))
+            self.ons_items.append(item)
+
+        self.whitehall_results = []
+        for n in range(WHITEHALL_RESULTS * scale):
+            template = whitehall_templates[n % len(whitehall_templates)]
+            publishers = rnd.sample(labels, min(2, len(labels)))
+            self.whitehall_results.append({'result': dict(
+                template,
+                id=n,
+                url=f'/government/statistics/benchmark-{n}',
+                organisations=f'<abbr title="{publishers[0]}">X</abbr> and {publishers[-1]}',
+                public_timestamp=(newest - timedelta(hours=n)).isoformat()
+            )})
+
+        header = ['Producer', 'Title', 'Frequency', 'Status', 'Link', 'Size', 'Name of table', 'Topic dimensions',
+                  'Geography', 'Time period', 'Unit of measure', 'Metadata', 'Format']
+        self.sheets = {'Index': [['Organisation', 'URL']] + [[f'Org {n}', f'http://example.org/{n}']
+                                                              for n in range(SHEETS * scale)],
+                       'Template': [header]}
+        for n in range(SHEETS * scale):
+            rows = [header]
+            for row in range(SHEET_ROWS):
+                if row % 5 == 0:
+                    rows.append([f'Organisation {n}', f'Dataset {row}', rnd.choice(['Y', 'Q (quarterly)', 'M']),
+                                 'Official Statistics', f'http://example.org/{n}/{row}', '12kb', f'Table {row}',
+                                 ', '.join(rnd.sample(['age', 'sex', 'region', 'industry', 'income'], 2)),
+                                 'UK', '2020', 'count', 'http://example.org/metadata', 'CSV'])
+                else:
+                    rows.append(['', '', '', '', '', '1MB', f'Table {row}', 'age', 'England', '2020', 'GBP',
+                                 '', 'XLS'])
+            self.sheets[f'Org {n}'] = rows
+
+    def ons_page(self, start, limit):
+        return {'totalItems': len(self.ons_items), 'items': self.ons_items[start:start + limit]}
+
+    def whitehall_page(self, page):
+        results = self.whitehall_results[(page - 1) * WHITEHALL_PAGE:page * WHITEHALL_PAGE]
+        response = {'results': results}
+        if page * WHITEHALL_PAGE < len(self.whitehall_results):
+            response['next_page_url'] = f'statistics.json?page={page + 1}'
+        return response
+
+    def sparql_orgs(self):
+        return {'results': {'bindings': [{'org': {'value': uri}, 'label': {'value': label}}
+                                         for label, uri in self.orgs.items()]}}
+
+
+def stand_in(catalogue):
+    # serves the catalogue in place of api.ons.gov.uk, www.gov.uk and the organisations SPARQL endpoint
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == '/ons/dataset':
+                self.send_json(catalogue.ons_page(int(query['start'][0]), int(query['limit'][0])))
+            elif url.path == '/govuk/government/statistics.json':
+                self.send_json(catalogue.whitehall_page(int(query.get('page', ['1'])[0])))
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path == '/sparql':
+                self.send_json(catalogue.sparql_orgs())
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_fetcher(name, args, env, workdir):
+    summary_path = os.path.join(workdir, f'{name}-summary.json')
+    env = dict(env, REGISTRY_SUMMARY=summary_path)
+    with open(os.path.join(workdir, f'{name}.log'), 'w') as log:
+        started = time.monotonic()
+        process = subprocess.Popen([sys.executable, os.path.join(here, f'fetch_{name}.py')] + args,
+                                   env=env, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 rather than wait, for the child's own resource usage
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.monotonic() - started
+    counters = {}
+    if os.path.exists(summary_path):
+        with open(summary_path) as f:
+            counters = json.load(f)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    items = counters.get('items', 0)
+    return {
+        'fetcher': name,
+        'exit_code': process.returncode,
+        'seconds': round(elapsed, 2),
+        'pages': counters.get('pages', 0),
+        'items': items,
+        'rows': counters.get('rows', 0),
+        'pages_per_second': round(counters.get('pages', 0) / elapsed, 2),
+        'rows_per_second': round(counters.get('rows', 0) / elapsed, 1),
+        'sql_per_item': round(counters.get('sql_statements', 0) / items, 2) if items > 0 else None,
+        'peak_rss_mb': round(peak_rss / 1024 / 1024, 1)
+    }
+
+
+def time_searches(db):
+    # the median latency, in milliseconds, of searching what the fetcher wrote
+    from sqlobject import connectionForURI
+    from search import search
+    connection = connectionForURI(db)
+    latencies = []
+    for text in SEARCHES:
+        started = time.monotonic()
+        search(connection, text)
+        latencies.append(time.monotonic() - started)
+    connection.close()
+    return round(sorted(latencies)[len(latencies) // 2] * 1000, 2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the registry fetchers against local stand-ins for their APIs and a throwaway '
+                    'database.')
+    parser.add_argument('--scale', type=int, action='append', metavar='N',
+                        help='catalogue size as a multiple of the current one; may be repeated, default 1, 10, 100')
+    parser.add_argument('--fetcher', action='append', choices=['ons', 'whitehall', 'sheet'],
+                        help='fetchers to run; may be repeated, default all')
+    parser.add_argument('--recorded', metavar='DIR',
+                        help='scale up recorded responses (ons.json, whitehall.json and sparql.json) instead of the '
+                             'built-in templates')
+    parser.add_argument('--db', metavar='URI',
+                        help='SQLObject URI of an empty database to use, rather than a fresh SQLite file per run; '
+                             'it is written to')
+    parser.add_argument('--keep', action='store_true', help='keep the working directories and fetcher logs')
+    parser.add_argument('--output', metavar='PATH', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scale or [1, 10, 100]:
+        catalogue = Catalogue(scale, recorded=args.recorded)
+        server = stand_in(catalogue)
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        for name in args.fetcher or ['sheet', 'whitehall', 'ons']:
+            workdir = tempfile.mkdtemp(prefix=f'benchmark-{name}-{scale}x-')
+            db = args.db or 'sqlite:' + os.path.join(workdir, 'registry.db')
+            env = dict(os.environ,
+                       REGISTRY_DB=db,
+                       ONS_API=f'{base}/ons',
+                       GOVUK_STATISTICS=f'{base}/govuk/government/statistics.json',
+                       ORGS_SPARQL=f'{base}/sparql',
+                       HTTP_CACHE=os.path.join(workdir, 'http-cache.sqlite'))
+            env.pop('METRICS_FILE', None)
+            fetcher_args = {'ons': ['--full'], 'whitehall': [], 'sheet': []}[name]
+            if name == 'sheet':
+                sheet_path = os.path.join(workdir, 'sheet.json')
+                with open(sheet_path, 'w') as f:
+                    json.dump(catalogue.sheets, f)
+                fetcher_args = ['--source', sheet_path]
+                if db.startswith('sqlite:'):
+                    # SQLite has no CREATE TABLE ... LIKE or multi-table RENAME for the staging swap
+                    fetcher_args.append('--diff')
+            result = dict(run_fetcher(name, fetcher_args, env, workdir), scale=scale)
+            result['search_ms'] = time_searches(db) if result['exit_code'] == 0 else None
+            results.append(result)
+            print(f"{name} {scale}x: {result['seconds']}s, {result['pages_per_second']} pages/s, "
+                  f"{result['rows_per_second']} rows/s, {result['sql_per_item']} SQL/item, "
+                  f"{result['peak_rss_mb']} MB peak RSS, {result['search_ms']} ms/search" +
+                  ('' if result['exit_code'] == 0 else f", failed with {result['exit_code']} (see {workdir})"))
+            if not args.keep and result['exit_code'] == 0:
+                for entry in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, entry))
+                os.rmdir(workdir)
+        server.shutdown()
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(result['exit_code'] == 0 for result in results) else 1)
@@ -1,5 +1,5 @@
 #!/bin/bash
 
-(sleep 60; /etc/periodic/daily/fetch.sh) &
+wait-for-it.sh -t 0 sqldb:3306
 
 exec "$@"
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import archive
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+sources = {
+    'sheet': 'fetch_sheet.py',
+    'whitehall': 'fetch_whitehall.py',
+    'ons': 'fetch_ons.py'
+}
+# the sources that can walk everything rather than only what's new; the spreadsheet is read whole every time
+full_sources = ['whitehall', 'ons']
+
+
+class Run:
+    # One fetcher running in its own process, leaving its counters in a temporary summary file.
+    def __init__(self, name, script, timeout, args=()):
+        self.name = name
+        self.timeout = timeout
+        fd, self.summary_path = tempfile.mkstemp(prefix=f'{name}-', suffix='.json')
+        os.close(fd)
+        self.started = time.monotonic()
+        self.finished = None
+        self.timed_out = False
+        self.process = subprocess.Popen([sys.executable, os.path.join(here, script)] + list(args),
+                                        env=dict(os.environ, REGISTRY_SUMMARY=self.summary_path))
+
+    def poll(self, now):
+        if self.finished is None:
+            if self.process.poll() is not None:
+                self.finished = now
+            elif now - self.started > self.timeout:
+                self.timed_out = True
+                self.process.kill()
+                self.process.wait()
+                self.finished = now
+        return self.finished is not None
+
+    def summary(self):
+        counters = {}
+        try:
+            with open(self.summary_path) as f:
+                counters = json.load(f)
+        except (OSError, ValueError):
+            pass
+        os.remove(self.summary_path)
+        return {
+            'source': self.name,
+            'status': 'timeout' if self.timed_out else 'ok' if self.process.returncode == 0 else 'failed',
+            'exit_code': self.process.returncode,
+            'duration': round(self.finished - self.started, 1),
+            'pages': counters.get('pages', 0),
+            'rows': counters.get('rows', 0),
+            'errors': counters.get('errors', 0)
+        }
+
+
+def timeout_arg(value):
+    name, seconds = value.split('=', 1)
+    if name not in sources:
+        raise argparse.ArgumentTypeError(f'unknown source {name}')
+    return name, int(seconds)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh all the registries concurrently.')
+    parser.add_argument('--timeout', type=timeout_arg, action='append', default=[], metavar='SOURCE=SECONDS',
+                        help='time limit for one source, e.g. ons=7200')
+    parser.add_argument('--default-timeout', type=int, default=4 * 60 * 60, metavar='SECONDS',
+                        help='time limit for sources without their own')
+    parser.add_argument('--summary', metavar='PATH', help='also write the run summary to this JSON file')
+    parser.add_argument('--no-link', action='store_true', help="don't link datasets across the registries afterwards")
+    parser.add_argument('--no-export', action='store_true', help="don't export an RDF snapshot afterwards")
+    parser.add_argument('--no-feeds', action='store_true', help="don't export the visualisations' feeds afterwards")
+    parser.add_argument('--full', action='store_true',
+                        help='have every source walk all of its pages rather than stopping where nothing is new')
+    parser.add_argument('--replay', metavar='DIR',
+                        help="rebuild from the archives in this directory rather than fetching: each source's "
+                             "newest full crawl and the runs after it, replayed in order, one run each")
+    # not choices=, which rejects an empty list of sources before Python 3.12
+    parser.add_argument('only', nargs='*', metavar='SOURCE',
+                        help=f"sources to refresh, of {', '.join(sources)}; all of them if none are given")
+    args = parser.parse_args()
+    for name in args.only:
+        if name not in sources:
+            parser.error(f"unknown source {name}, not one of {', '.join(sources)}")
+
+    timeouts = dict(args.timeout)
+    # each source's runs, one after another, and the sources alongside each other
+    queues = {name: [['--full'] if args.full and name in full_sources else []]
+              for name in sources if len(args.only) == 0 or name in args.only}
+    summary = []
+    if args.replay is not None:
+        queues = {name: [['--replay', path] for path in archive.chain(args.replay, name)] for name in queues}
+        for name, queue in queues.items():
+            if len(queue) == 0:
+                print(f'{name}: no full crawl in {args.replay} to rebuild from', file=sys.stderr)
+                summary.append({'source': name, 'status': 'failed', 'exit_code': None, 'duration': 0,
+                                'pages': 0, 'rows': 0, 'errors': 1})
+    runs = {name: Run(name, sources[name], timeouts.get(name, args.default_timeout), queue.pop(0))
+            for name, queue in queues.items() if len(queue) > 0}
+    while len(runs) > 0:
+        time.sleep(1)
+        for name, run in list(runs.items()):
+            if run.poll(time.monotonic()):
+                summary.append(run.summary())
+                del runs[name]
+                # a replay that failed would leave the next one carrying on from the wrong state
+                if len(queues[name]) > 0 and summary[-1]['status'] == 'ok':
+                    runs[name] = Run(name, sources[name], timeouts.get(name, args.default_timeout),
+                                     queues[name].pop(0))
+    # linking, the snapshot and the feeds come once the refreshes have all finished, so they're consistent
+    # across registries, with linking first so that the snapshot includes the links
+    stages = [(name, script) for name, script, skip in [('link', 'link_datasets.py', args.no_link),
+                                                        ('export', 'export_rdf.py', args.no_export),
+                                                        ('feeds', 'export_feeds.py', args.no_feeds)] if not skip]
+    if any(result['status'] == 'ok' for result in summary):
+        for name, script in stages:
+            stage = Run(name, script, args.default_timeout)
+            while not stage.poll(time.monotonic()):
+                time.sleep(1)
+            summary.append(stage.summary())
+    for result in summary:
+        print(f"{result['source']}: {result['status']} in {result['duration']}s, {result['pages']} pages, "
+              f"{result['rows']} rows written, {result['errors']} errors")
+    if args.summary is not None:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(0 if all(result['status'] == 'ok' for result in summary) else 1)
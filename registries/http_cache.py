@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from cachecontrol import CacheControl
+from cachecontrol.cache import BaseCache
+from cachecontrol.heuristics import LastModified
+from requests import Session
+
+import metrics
+
+
+class SQLiteCache(BaseCache):
+    # A CacheControl store kept in a single SQLite file. Once the stored responses grow past max_bytes,
+    # the least recently used ones are evicted, as is anything not read for max_age seconds.
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, max_age=30 * 24 * 60 * 60):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS response (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            accessed REAL NOT NULL,
+            expires REAL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS response_accessed ON response (accessed)')
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'bytes_read': 0, 'bytes_written': 0}
+        with self.lock:
+            self._evict_stale(time.time())
+            self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.db.execute('SELECT value, expires FROM response WHERE key = ?', (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                self.stats['misses'] += 1
+                return None
+            self.db.execute('UPDATE response SET accessed = ? WHERE key = ?', (now, key))
+            self.stats['hits'] += 1
+            self.stats['bytes_read'] += len(row[0])
+            return row[0]
+
+    def set(self, key, value, expires=None):
+        now = time.time()
+        if isinstance(expires, datetime):
+            expires = expires.replace(tzinfo=expires.tzinfo or timezone.utc).timestamp()
+        elif expires is not None:
+            expires = now + expires
+        with self.lock:
+            self._delete(key)
+            self.db.execute('INSERT INTO response (key, value, size, accessed, expires) VALUES (?, ?, ?, ?, ?)',
+                            (key, value, len(value), now, expires))
+            self.total_bytes += len(value)
+            self.stats['stores'] += 1
+            self.stats['bytes_written'] += len(value)
+            if self.total_bytes > self.max_bytes:
+                self._evict_lru()
+
+    def delete(self, key):
+        with self.lock:
+            self._delete(key)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _delete(self, key):
+        row = self.db.execute('SELECT size FROM response WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.db.execute('DELETE FROM response WHERE key = ?', (key,))
+            self.total_bytes -= row[0]
+
+    def _evict_stale(self, now):
+        evicted = self.db.execute('DELETE FROM response WHERE accessed < ? OR expires < ?',
+                                  (now - self.max_age, now)).rowcount
+        self.stats['evictions'] += evicted
+
+    def _evict_lru(self):
+        # make room for a while, rather than evicting on every store once full, going by what's actually
+        # held now, since other fetchers share the file
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+        target = self.max_bytes * 0.9
+        freed = 0
+        keys = []
+        for key, size in self.db.execute('SELECT key, size FROM response ORDER BY accessed'):
+            if self.total_bytes - freed <= target:
+                break
+            keys.append(key)
+            freed += size
+        self.db.executemany('DELETE FROM response WHERE key = ?', [(key,) for key in keys])
+        self.total_bytes -= freed
+        self.stats['evictions'] += len(keys)
+
+
+shared_cache = None
+
+
+def cache():
+    global shared_cache
+    if shared_cache is None:
+        shared_cache = SQLiteCache(os.environ.get('HTTP_CACHE', '.cache.sqlite'),
+                                   max_bytes=int(os.environ.get('HTTP_CACHE_MAX_MB', '256')) * 1024 * 1024,
+                                   max_age=int(os.environ.get('HTTP_CACHE_MAX_DAYS', '30')) * 24 * 60 * 60)
+    return shared_cache
+
+
+def cached_session():
+    return metrics.instrument_session(CacheControl(Session(), cache=cache(), heuristic=LastModified()))
+
+
+def report():
+    if shared_cache is not None:
+        stats = shared_cache.stats
+        for name, value in stats.items():
+            metrics.gauge(f'http_cache_{name}', value)
+        metrics.gauge('http_cache_bytes', shared_cache.total_bytes)
+        print(f"HTTP cache: {stats['hits']} hits, {stats['misses']} misses, {stats['stores']} stores, "
+              f"{stats['evictions']} evicted, {shared_cache.total_bytes} bytes held")
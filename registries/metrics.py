@@ -0,0 +1,151 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# upper bounds, in seconds, of the buckets latencies are counted into
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+job = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+lock = threading.Lock()
+counters = {}
+histograms = {}
+gauges = {}
+
+
+def key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def count(name, n=1, **labels):
+    with lock:
+        counters[key(name, labels)] = counters.get(key(name, labels), 0) + n
+
+
+def observe(name, value, **labels):
+    with lock:
+        histogram = histograms.setdefault(key(name, labels), {'buckets': [0] * len(BUCKETS), 'sum': 0, 'count': 0})
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+def gauge(name, value, **labels):
+    with lock:
+        gauges[key(name, labels)] = value
+
+
+@contextmanager
+def timed(name, **labels):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - started, **labels)
+
+
+def instrument_connection(connection):
+    # every statement SQLObject runs, whether through a transaction or not, ends up in _executeRetry
+    execute = connection._executeRetry
+
+    def timed_execute(conn, cursor, query):
+        statement = query.lstrip().split(None, 1)[0].upper() if query.strip() != '' else ''
+        count('sql_statements', statement=statement)
+        with timed('sql_seconds', statement=statement):
+            return execute(conn, cursor, query)
+    connection._executeRetry = timed_execute
+    return connection
+
+
+def instrument_session(session):
+    def record(response, *args, **kwargs):
+        host = urlparse(response.url).hostname
+        cache = 'hit' if getattr(response, 'from_cache', False) else 'miss'
+        count('http_requests', host=host, status=str(response.status_code), cache=cache)
+        if cache == 'miss':
+            observe('http_request_seconds', response.elapsed.total_seconds(), host=host)
+    session.hooks['response'].append(record)
+    return session
+
+
+def total(name):
+    return sum(value for (counter, labels), value in counters.items() if counter == name)
+
+
+def prometheus_labels(labels):
+    if len(labels) == 0:
+        return ''
+    return '{' + ','.join('%s="%s"' % (label, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for label, value in labels) + '}'
+
+
+def prometheus():
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+    for (name, labels), value in sorted(counters.items()):
+        declare(f'registry_{name}_total', 'counter')
+        lines.append(f'registry_{name}_total{prometheus_labels(((("job", job),) + labels))} {value}')
+    for (name, labels), value in sorted(gauges.items()):
+        declare(f'registry_{name}', 'gauge')
+        lines.append(f'registry_{name}{prometheus_labels(((("job", job),) + labels))} {value}')
+    for (name, labels), histogram in sorted(histograms.items()):
+        declare(f'registry_{name}', 'histogram')
+        labels = (('job', job),) + labels
+        for bound, n in zip(BUCKETS, histogram['buckets']):
+            lines.append(f'registry_{name}_bucket{prometheus_labels(labels + (("le", str(bound)),))} {n}')
+        lines.append(f'registry_{name}_bucket{prometheus_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+        lines.append(f'registry_{name}_sum{prometheus_labels(labels)} {histogram["sum"]}')
+        lines.append(f'registry_{name}_count{prometheus_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def json_lines():
+    now = time.time()
+    records = []
+    for kind, samples in [('counter', counters), ('gauge', gauges), ('histogram', histograms)]:
+        for (name, labels), value in sorted(samples.items()):
+            records.append({'time': now, 'job': job, 'type': kind, 'name': name, 'labels': dict(labels),
+                            'value': value})
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def write_metrics():
+    # METRICS_FILE may contain {job}, so that concurrent fetchers don't write over each other. A .prom
+    # file is replaced in one go, for node_exporter's textfile collector; anything else is appended to as
+    # JSON lines.
+    path = os.environ.get('METRICS_FILE')
+    if path is None:
+        return
+    path = path.format(job=job)
+    with lock:
+        if path.endswith('.prom'):
+            with open(path + '.tmp', 'w') as f:
+                f.write(prometheus())
+            os.replace(path + '.tmp', path)
+        else:
+            with open(path, 'a') as f:
+                f.write(json_lines())
+
+
+def write_summary():
+    # fetch_all.py tells each fetcher where to leave its totals
+    path = os.environ.get('REGISTRY_SUMMARY')
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump({name: total(name) for name in ['pages', 'items', 'rows', 'errors', 'sql_statements']}, f)
+
+
+# written however the fetcher exits, so a failed run still reports how far it got
+atexit.register(write_summary)
+atexit.register(write_metrics)
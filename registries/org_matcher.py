@@ -0,0 +1,50 @@
+from collections import deque
+
+
+class OrganisationMatcher:
+    # An Aho-Corasick automaton over each of the ways an organisation's label can appear in a search
+    # result's 'organisations' field: in a title="..." attribute, followed by ' and ' or ', ', or at the
+    # very end. A single pass over the field finds every label that one of those tests would accept.
+    END = '\0'
+
+    def __init__(self, labels):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for label in labels:
+            for pattern in (f'title="{label}"', f'{label} and ', f'{label}, ', label + self.END):
+                self._add(pattern, label)
+        self._link()
+
+    def _add(self, pattern, label):
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append(label)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback != 0 and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def matches(self, text):
+        found = set()
+        state = 0
+        for char in text + self.END:
+            while state != 0 and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found.update(self.output[state])
+        return found
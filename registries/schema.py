@@ -0,0 +1,112 @@
+import re
+
+# Indexes beyond the ones SQLObject creates, as (table, columns, unique). A column may carry a prefix length,
+# which MySQL needs to index a TEXT column and SQLite ignores.
+INDEXES = [
+    ('ons_distribution', ['release_date', 'uri(255)'], False),
+    ('ons_distribution', ['next_release'], False),
+    ('ons_contact', ['email(100)', 'name(100)'], False),
+    ('ons_dataset_ons_keyword', ['ons_dataset_id', 'ons_keyword_id'], True),
+    ('ons_dataset_ons_keyword', ['ons_keyword_id'], False),
+    ('ons_dataset_ons_distribution', ['ons_dataset_id', 'ons_distribution_id'], True),
+    ('ons_dataset_ons_distribution', ['ons_distribution_id'], False),
+    ('ons_contact_ons_distribution', ['ons_distribution_id', 'ons_contact_id'], True),
+    ('ons_contact_ons_distribution', ['ons_contact_id'], False),
+    ('ons_sync_run', ['finished'], False),
+    ('wh_dataset', ['publication_date'], False),
+    ('wh_collection', ['uri(255)'], False),
+    ('wh_dataset_wh_organisation', ['wh_dataset_id', 'wh_organisation_id'], True),
+    ('wh_dataset_wh_organisation', ['wh_organisation_id'], False),
+    ('wh_collection_wh_dataset', ['wh_dataset_id', 'wh_collection_id'], True),
+    ('wh_collection_wh_dataset', ['wh_collection_id'], False),
+    ('sh_dataset', ['organisation_id', 'title(100)', 'link(100)'], False),
+    ('sh_stats', ['dataset_id', 'name(100)'], False),
+    ('sh_stats_sh_topic', ['sh_stats_id', 'sh_topic_id'], True),
+    ('sh_stats_sh_topic', ['sh_topic_id'], False),
+    ('dataset_link', ['source_table', 'source_id'], False),
+    ('dataset_link', ['target_table', 'target_id'], False)
+]
+
+# Full-text indexes over the columns search.py searches, as (table, columns). MySQL keeps a FULLTEXT index up
+# to date itself; on SQLite they're FTS5 tables over the table's contents, kept up to date by triggers.
+FULLTEXT_INDEXES = [
+    ('ons_dataset', ['title', 'summary']),
+    ('ons_keyword', ['keyword']),
+    ('wh_dataset', ['title']),
+    ('sh_stats', ['name'])
+]
+
+prefix_length = re.compile(r'\(\d+\)$')
+
+
+def index_names(connection, table):
+    if connection.dbName == 'sqlite':
+        return {row[1] for row in connection.queryAll(f"PRAGMA index_list({table})")}
+    return {row[2] for row in connection.queryAll(f"SHOW INDEX FROM {table}")}
+
+
+def has_duplicates(connection, table, columns):
+    return len(connection.queryAll(
+        f"SELECT 1 FROM {table} GROUP BY {', '.join(columns)} HAVING COUNT(*) > 1 LIMIT 1")) > 0
+
+
+def ensure_indexes(connection, prefix):
+    # Each fetcher migrates its own tables once they exist, so no two processes alter the same table. A
+    # unique index over rows that already hold duplicates is created as an ordinary one instead.
+    for table, columns, unique in INDEXES:
+        if not table.startswith(prefix) or not connection.tableExists(table):
+            continue
+        names = [prefix_length.sub('', column) for column in columns]
+        name = f"{table}_{'_'.join(names)}"[:64]
+        if name in index_names(connection, table):
+            continue
+        if unique and has_duplicates(connection, table, names):
+            print(f"{table} has duplicate {', '.join(names)} rows, so {name} isn't unique")
+            unique = False
+        connection.query(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} "
+                         f"({', '.join(names if connection.dbName == 'sqlite' else columns)})")
+        print(f"Created index {name}")
+    for table, columns in FULLTEXT_INDEXES:
+        if table.startswith(prefix) and connection.tableExists(table):
+            ensure_fulltext(connection, table, columns)
+
+
+def fulltext_name(connection, table, columns):
+    # the FULLTEXT index on MySQL, the FTS5 table on SQLite
+    if connection.dbName == 'sqlite':
+        return f"{table}_fts"
+    return f"{table}_{'_'.join(columns)}_text"[:64]
+
+
+def has_fulltext(connection, table, columns):
+    if connection.dbName == 'sqlite':
+        return connection.tableExists(fulltext_name(connection, table, columns))
+    return connection.tableExists(table) and fulltext_name(connection, table, columns) in index_names(connection, table)
+
+
+def ensure_fulltext(connection, table, columns):
+    if connection.dbName != 'sqlite':
+        name = fulltext_name(connection, table, columns)
+        if name not in index_names(connection, table):
+            connection.query(f"CREATE FULLTEXT INDEX {name} ON {table} ({', '.join(columns)})")
+            print(f"Created full-text index {name}")
+        return
+    fts = fulltext_name(connection, table, columns)
+    if connection.tableExists(fts):
+        return
+
+    def values(row):
+        return ', '.join([f"{row}.id"] + [f"{row}.{column}" for column in columns])
+    listed = ', '.join(['rowid'] + columns)
+    connection.query(f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{table}', "
+                     f"content_rowid='id')")
+    connection.query(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+                     f"INSERT INTO {fts} ({listed}) VALUES ({values('new')}); END")
+    connection.query(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+                     f"INSERT INTO {fts} ({fts}, {listed}) VALUES ('delete', {values('old')}); END")
+    connection.query(f"CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN "
+                     f"INSERT INTO {fts} ({fts}, {listed}) VALUES ('delete', {values('old')}); "
+                     f"INSERT INTO {fts} ({listed}) VALUES ({values('new')}); END")
+    # rows from before the index
+    connection.query(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    print(f"Created full-text table {fts}")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from pyoxigraph import Store, QuerySolutions, QueryBoolean, QueryResultsFormat, RdfFormat
+
+import metrics
+from export_rdf import current_store
+
+# what a query's results can be given as, by media type, best first, as SPARQL protocol clients ask for them
+RESULTS_FORMATS = [
+    ('application/sparql-results+json', QueryResultsFormat.JSON),
+    ('application/sparql-results+xml', QueryResultsFormat.XML),
+    ('text/csv', QueryResultsFormat.CSV),
+    ('text/tab-separated-values', QueryResultsFormat.TSV)
+]
+GRAPH_FORMATS = [
+    ('application/n-triples', RdfFormat.N_TRIPLES),
+    ('text/turtle', RdfFormat.TURTLE),
+    ('application/rdf+xml', RdfFormat.RDF_XML)
+]
+
+
+def negotiate(accept, formats):
+    # the first of the formats the client accepts at all, or else the first
+    accepted = [part.split(';')[0].strip() for part in (accept or '').split(',')]
+    for media_type, format in formats:
+        if media_type in accepted:
+            return media_type, format
+    return formats[0]
+
+
+class Snapshot:
+    # The store export_rdf.py loaded last, opened read-only, and opened again once a newer one is current.
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.path = None
+        self.store = None
+
+    def get(self):
+        with self.lock:
+            path = current_store(self.directory)
+            if path != self.path:
+                self.store = Store.read_only(path) if path is not None else None
+                self.path = path
+            return self.store
+
+
+class SparqlHandler(BaseHTTPRequestHandler):
+    # The SPARQL protocol's query operation, GET or POST /sparql, answered from the snapshot rather than
+    # by D2R, which is only asked while there's no snapshot yet.
+    snapshot = None
+    fallback = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.answer(url, parse_qs(url.query).get('query', [None])[0], None)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', '0')))
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip()
+        if content_type == 'application/sparql-query':
+            query = body.decode('utf-8')
+        else:
+            query = parse_qs(body.decode('utf-8')).get('query', [None])[0]
+        self.answer(url, query, body)
+
+    def answer(self, url, query, body):
+        if url.path.rstrip('/') != '/sparql':
+            self.send_error(404)
+            return
+        store = self.snapshot.get()
+        if store is None and self.fallback is not None:
+            self.forward(url, body)
+            return
+        if store is None:
+            self.send_error(503, 'no snapshot loaded yet')
+            return
+        if query is None:
+            self.send_error(400, 'query is missing')
+            return
+        try:
+            with metrics.timed('sparql_seconds'):
+                results = store.query(query)
+                if isinstance(results, (QuerySolutions, QueryBoolean)):
+                    media_type, format = negotiate(self.headers.get('Accept'), RESULTS_FORMATS)
+                else:
+                    media_type, format = negotiate(self.headers.get('Accept'), GRAPH_FORMATS)
+                body = results.serialize(format=format)
+        except SyntaxError as e:
+            self.send_error(400, str(e).splitlines()[0])
+            return
+        except Exception as e:
+            self.log_error('query failed: %r', e)
+            metrics.count('errors')
+            self.send_error(500, 'query failed')
+            return
+        self.respond(200, media_type, body)
+
+    def forward(self, url, body):
+        resp = requests.request(self.command, self.fallback + ('?' + url.query if url.query else ''), data=body,
+                                headers={name: self.headers[name] for name in ['Accept', 'Content-Type']
+                                         if name in self.headers})
+        self.respond(resp.status_code, resp.headers.get('Content-Type', 'text/plain'), resp.content)
+
+    def respond(self, status, media_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', media_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Answer SPARQL queries from the latest RDF snapshot.')
+    parser.add_argument('--store', metavar='DIR', default=os.environ.get('RDF_STORE', '/data/store'),
+                        help='directory export_rdf.py --store loads the snapshots into')
+    parser.add_argument('--fallback', metavar='URL', default=os.environ.get('SPARQL_FALLBACK'),
+                        help='SPARQL endpoint to pass queries on to until there is a snapshot')
+    parser.add_argument('--port', type=int, default=8001, help='port to answer on')
+    args = parser.parse_args()
+
+    SparqlHandler.snapshot = Snapshot(args.store)
+    SparqlHandler.fallback = args.fallback
+    ThreadingHTTPServer(('', args.port), SparqlHandler).serve_forever()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from sqlobject import connectionForURI
+
+from export_rdf import export, open_rdf, load_store, current_store, pyoxigraph
+
+BASE = 'https://example.org/resource/'
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.connection = connectionForURI('sqlite:' + os.path.join(self.directory, 'registry.db'))
+        for statement in [
+                "CREATE TABLE sh_organisation (id INTEGER PRIMARY KEY, sheet_name TEXT, long_name TEXT, link TEXT)",
+                "CREATE TABLE sh_dataset (id INTEGER PRIMARY KEY, organisation_id INT, title TEXT, frequency TEXT, "
+                "frequency_notes TEXT, link TEXT, status TEXT, size INT)",
+                "CREATE TABLE wh_dataset (id INTEGER PRIMARY KEY, url TEXT, title TEXT, whitehall_id INT, "
+                "stats_type TEXT, publication_date TIMESTAMP, government_name TEXT)",
+                "CREATE TABLE ons_contact (id INTEGER PRIMARY KEY, email TEXT, name TEXT, telephone TEXT)",
+                "INSERT INTO sh_organisation VALUES (1, 'ONS', NULL, ' http://example.org/ons ')",
+                "INSERT INTO sh_dataset VALUES (1, 1, 'Spaced', 'Q', NULL, 'http://example.org/some page ', NULL, NULL)",
+                "INSERT INTO sh_dataset VALUES (2, 1, 'Fine', 'Q', NULL, 'http://example.org/fine', NULL, NULL)",
+                "INSERT INTO sh_dataset VALUES (3, 1, 'Bracketed', 'Q', NULL, '<http://example.org/x>', NULL, NULL)",
+                "INSERT INTO wh_dataset VALUES (1, 'https://www.gov.uk/a b', 'Bad URL', 1, NULL, NULL, NULL)",
+                "INSERT INTO wh_dataset VALUES (2, 'https://www.gov.uk/good', 'Good URL', 2, NULL, NULL, NULL)",
+                "INSERT INTO ons_contact VALUES (1, 'stats at ons', 'Ann', NULL)"]:
+            self.connection.query(statement)
+        self.path = os.path.join(self.directory, 'data.nt')
+        export(self.connection, BASE, self.path)
+        with open_rdf(self.path) as f:
+            self.lines = f.read().splitlines()
+
+    def test_bad_links_are_left_out(self):
+        self.assertFalse(any('some page' in line or '<<' in line or 'a b' in line for line in self.lines))
+        self.assertFalse(any('mailto:' in line for line in self.lines))
+
+    def test_links_are_stripped(self):
+        self.assertIn(f'<{BASE}sh_organisation/1> <https://ons.gov.uk/ns/solarsystem#organisation_link> '
+                      f'<http://example.org/ons> .', self.lines)
+
+    def test_the_rest_of_the_rows_are_exported(self):
+        self.assertIn(f'<{BASE}sh_dataset/1> <http://www.w3.org/2000/01/rdf-schema#label> "Spaced" .', self.lines)
+        self.assertIn(f'<{BASE}sh_dataset/2> <https://ons.gov.uk/ns/solarsystem#dataset_link> '
+                      f'<http://example.org/fine> .', self.lines)
+        self.assertIn('<https://www.gov.uk/good> <http://www.w3.org/2000/01/rdf-schema#label> "Good URL" .',
+                      self.lines)
+        self.assertFalse(any('Bad URL' in line for line in self.lines))
+
+    @unittest.skipIf(pyoxigraph is None, 'pyoxigraph is not installed')
+    def test_store_answers_queries(self):
+        store = os.path.join(self.directory, 'store')
+        load_store(self.path, store)
+        results = pyoxigraph.Store.read_only(current_store(store)).query('SELECT * WHERE { ?s ?p ?o }')
+        self.assertEqual(len(list(results)), len(set(self.lines)))
+
+
+if __name__ == '__main__':
+    unittest.main()
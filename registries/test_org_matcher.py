@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from org_matcher import OrganisationMatcher
+
+
+def substring_matches(labels, text):
+    # the four tests fetch_whitehall.py made of each label in turn before the matcher
+    return {label for label in labels
+            if text.endswith(label) or f'title="{label}"' in text or f'{label} and ' in text or f'{label}, ' in text}
+
+
+class OrganisationMatcherTest(unittest.TestCase):
+    def assertMatchesSubstrings(self, labels, text):
+        self.assertEqual(substring_matches(labels, text), OrganisationMatcher(labels).matches(text), text)
+
+    def test_search_results(self):
+        labels = ['Office for National Statistics', 'Department for Education', 'Welsh Government']
+        for text in ['<abbr title="Office for National Statistics">ONS</abbr>',
+                     'Department for Education and Welsh Government',
+                     'Office for National Statistics, Department for Education and Welsh Government',
+                     'Welsh Government',
+                     'Department of Health', '']:
+            self.assertMatchesSubstrings(labels, text)
+
+    def test_labels_sharing_a_prefix(self):
+        labels = ['Office', 'Office for National Statistics', 'Office for Students', 'Office for Nat']
+        for text in ['Office for National Statistics', 'Office for Students and Office', 'Office, Office for Nat',
+                     '<abbr title="Office">O</abbr>', 'Office for National Statistics, Office for Students']:
+            self.assertMatchesSubstrings(labels, text)
+
+    def test_labels_containing_separators(self):
+        labels = ['Department for Business, Energy and Industrial Strategy', 'Business', 'Energy',
+                  'Industrial Strategy', 'Department for Business']
+        for text in ['Department for Business, Energy and Industrial Strategy',
+                     'Department for Business, Energy and Industrial Strategy and Energy',
+                     '<abbr title="Department for Business, Energy and Industrial Strategy">BEIS</abbr>, Business']:
+            self.assertMatchesSubstrings(labels, text)
+
+    def test_empty_label(self):
+        # as text.endswith('') always is, an empty label is found in everything
+        for text in ['Office for National Statistics', '', 'title=""']:
+            self.assertMatchesSubstrings(['', 'Office for National Statistics'], text)
+
+    def test_label_at_the_end(self):
+        labels = ['Statistics', 'National Statistics', 'Office for National Statistics']
+        for text in ['Office for National Statistics', 'Statistics', 'National Statistics and ',
+                     'Statistics, National', 'UK Statistics Authority']:
+            self.assertMatchesSubstrings(labels, text)
+
+    def test_random_corpus(self):
+        random.seed(1)
+        words = ['Office', 'for', 'National', 'Statistics', 'Department', 'and', 'of', ',', '"', 'title=', 'a', '']
+        for trial in range(500):
+            labels = list(dict.fromkeys(' '.join(random.choices(words, k=random.randint(0, 4)))
+                                        for _ in range(random.randint(1, 20))))
+            for _ in range(10):
+                parts = []
+                for _ in range(random.randint(0, 5)):
+                    label = random.choice(labels + ['junk'])
+                    parts.append(random.choice([label, f'<abbr title="{label}">X</abbr>', label + ' and ',
+                                                label + ', ', label + ',', ' ' + label]))
+                self.assertMatchesSubstrings(labels, ''.join(parts))
+
+
+if __name__ == '__main__':
+    unittest.main()
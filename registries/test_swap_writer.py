@@ -0,0 +1,43 @@
+import unittest
+
+from fetch_sheet import SwapWriter, Organisation, Dataset, Stats, Topic
+
+
+class RecordingConnection:
+    # the statements SwapWriter sends, in order, since it needs MySQL to run them
+    def __init__(self):
+        self.statements = []
+
+    def query(self, statement):
+        self.statements.append(statement)
+
+
+class SwapWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = RecordingConnection()
+        topicJoin = [join for join in Stats.sqlmeta.joins if join.joinMethodName == 'topics'][0]
+        SwapWriter(self.connection, [Stats, Topic, Dataset, Organisation], [topicJoin])
+
+    def test_staging_tables_keep_their_foreign_keys(self):
+        self.assertIn("ALTER TABLE sh_stats_staging ADD FOREIGN KEY (dataset_id) "
+                      "REFERENCES sh_dataset_staging (id) ON DELETE CASCADE", self.connection.statements)
+        self.assertIn("ALTER TABLE sh_dataset_staging ADD FOREIGN KEY (organisation_id) "
+                      "REFERENCES sh_organisation_staging (id) ON DELETE CASCADE", self.connection.statements)
+
+    def test_foreign_keys_come_after_the_tables_they_refer_to(self):
+        created = [statement.split()[2] for statement in self.connection.statements
+                   if statement.startswith('CREATE TABLE')]
+        for statement in self.connection.statements:
+            if statement.startswith('ALTER TABLE'):
+                self.assertIn(statement.split()[2], created)
+                self.assertIn(statement.split('REFERENCES ')[1].split()[0], created)
+
+    def test_children_are_dropped_before_their_parents(self):
+        dropped = [statement.split()[4].rstrip(',') for statement in self.connection.statements
+                   if statement.startswith('DROP TABLE')]
+        self.assertLess(dropped.index('sh_stats_staging'), dropped.index('sh_dataset_staging'))
+        self.assertLess(dropped.index('sh_dataset_staging'), dropped.index('sh_organisation_staging'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from requests import RequestException
+
+import archive
+import metrics
+
+# backoff between tries is drawn uniformly from zero up to this, doubling from BASE_BACKOFF to MAX_BACKOFF
+BASE_BACKOFF = 2
+MAX_BACKOFF = 300
+# a Retry-After longer than this is taken as the host being down for now
+MAX_RETRY_AFTER = 3600
+TRIES = 8
+
+
+class FetchFailed(Exception):
+    # A URL that couldn't be fetched, either because it used up its tries, or because its host's circuit is
+    # open, or because the host said it isn't worth asking again.
+    pass
+
+
+class TokenBucket:
+    # Allows `rate` requests a second on average, in bursts of up to `burst`. take() reserves a token and
+    # says how long the caller has to wait for it, so only the threads asking this host ever wait.
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    # Opens after `threshold` failures in a row, after which requests fail straight away instead of waiting on
+    # a host that isn't answering. Once `cooldown` seconds have passed, a single request is let through to
+    # try it again.
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.trying = False
+
+    def allow(self, now):
+        if self.opened is None:
+            return True
+        if not self.trying and now - self.opened >= self.cooldown:
+            self.trying = True
+            return True
+        return False
+
+    def succeeded(self):
+        self.failures = 0
+        self.opened = None
+        self.trying = False
+
+    def failed(self, now):
+        self.failures += 1
+        if self.trying or self.failures >= self.threshold:
+            self.opened = now
+        self.trying = False
+
+
+class Upstream:
+    # The rate limit, circuit breaker and any Retry-After hold for one host, shared by all the threads
+    # fetching from it.
+    def __init__(self, host):
+        self.host = host
+        self.lock = threading.Lock()
+        self.bucket = TokenBucket(float(os.environ.get('HTTP_RATE', '10')), int(os.environ.get('HTTP_BURST', '10')))
+        self.breaker = CircuitBreaker(int(os.environ.get('HTTP_BREAKER_FAILURES', '5')),
+                                      int(os.environ.get('HTTP_BREAKER_COOLDOWN', '300')))
+        self.held_until = 0
+
+    def admit(self, retrying=False):
+        # How long to wait before sending a request, or None if the circuit is open. A request already
+        # retrying gets the rest of its tries, open or not: the circuit is for new requests.
+        with self.lock:
+            now = time.monotonic()
+            if not retrying and not self.breaker.allow(now):
+                return None
+            return max(self.bucket.take(now), self.held_until - now)
+
+    def hold(self, seconds):
+        with self.lock:
+            self.held_until = max(self.held_until, time.monotonic() + seconds)
+
+    def succeeded(self):
+        with self.lock:
+            self.breaker.succeeded()
+
+    def failed(self):
+        with self.lock:
+            self.breaker.failed(time.monotonic())
+
+
+upstreams = {}
+upstreams_lock = threading.Lock()
+
+
+def upstream(host):
+    with upstreams_lock:
+        if host not in upstreams:
+            upstreams[host] = Upstream(host)
+        return upstreams[host]
+
+
+def retry_after(value):
+    # either a number of seconds or an HTTP date
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_json(session, url, method='GET', tries=TRIES, **kwargs):
+    if archive.replayer is not None:
+        try:
+            return archive.replayer.response(method, url, kwargs.get('data'))
+        except KeyError:
+            raise FetchFailed(f"{method} {url} isn't in the archive")
+    host = urlparse(url).hostname
+    up = upstream(host)
+    reason = None
+    for attempt in range(tries):
+        wait = up.admit(attempt > 0)
+        if wait is None:
+            metrics.count('circuit_open', host=host)
+            raise FetchFailed(f"{host} is failing, not fetching {url}")
+        time.sleep(wait)
+        delay = None
+        try:
+            resp = session.request(method, url, **kwargs)
+            if resp.status_code == 200:
+                try:
+                    data = resp.json()
+                    up.succeeded()
+                    if archive.recorder is not None:
+                        archive.recorder.record(method, url, kwargs.get('data'), data)
+                    return data
+                except ValueError:
+                    reason = 'response is not JSON'
+            else:
+                reason = f'HTTP {resp.status_code}'
+                if resp.status_code in (429, 503):
+                    delay = retry_after(resp.headers.get('Retry-After'))
+                elif 400 <= resp.status_code < 500 and resp.status_code != 408:
+                    # the host is working, it just won't give us this
+                    up.succeeded()
+                    raise FetchFailed(f"{url}: {reason}")
+        except RequestException as e:
+            # the host isn't answering at all, which the circuit is for
+            reason = str(e)
+            up.failed()
+        else:
+            # Anything else only counts against the host once the request has given up on it. A 429 or 503
+            # the host said when to retry is the host working as it should.
+            if attempt == tries - 1 or (delay is not None and delay > MAX_RETRY_AFTER):
+                up.failed()
+        if attempt == tries - 1:
+            break
+        if delay is not None and delay > MAX_RETRY_AFTER:
+            raise FetchFailed(f"{url}: {reason}, retry after {delay}s")
+        if delay is None:
+            delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+        else:
+            # everyone waits for the host, not only this request
+            up.hold(delay)
+        metrics.count('retry_sleeps', host=host)
+        metrics.count('retry_sleep_seconds', delay, host=host)
+        time.sleep(delay)
+    raise FetchFailed(f"Giving up on {url} after {tries} tries: {reason}")
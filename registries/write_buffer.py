@@ -0,0 +1,139 @@
+from sqlobject.sqlbuilder import Insert, Update, Delete, SQLConstant, SQLObjectState, AND, IN
+
+import metrics
+
+# the connections holding run_lock()s, kept open for as long as the process runs
+held_locks = []
+
+
+def run_lock(connection, source):
+    # The source's lock, held until the process exits, as WriteBuffer's ids are only safe while one run of
+    # an ingester writes its tables at a time. False if another run has it. It's a MySQL named lock, taken
+    # on a connection of its own so that nothing else can release it; other databases aren't locked.
+    if connection.dbName != 'mysql':
+        return True
+    raw = connection.getConnection()
+    cursor = raw.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, 0)", (f'registry-{source}',))
+    locked = cursor.fetchone()[0] == 1
+    cursor.close()
+    if locked:
+        held_locks.append(raw)
+    else:
+        connection.releaseConnection(raw)
+    return locked
+
+
+class WriteBuffer:
+    # A page's inserts, updates and join table changes, held in memory until flush() writes them all in one
+    # transaction: a multi-row INSERT per table, an UPDATE per changed row, a DELETE per removed join row
+    # and one per table for removed rows. If any of it fails, none of it is written. New rows are given
+    # ids here, counting up from the highest in the table, since each ingester is the only writer of its
+    # tables and run_lock() keeps it to one run at a time, so that they can be linked to before they're
+    # written. Tables are inserted into in the order of `order`, which should put the tables referred to
+    # first, and then in the order they were first added to; rows are deleted in the order their tables
+    # were first deleted from.
+    batch_size = 500
+
+    def __init__(self, connection, order=()):
+        self.connection = connection
+        self.order = list(order)
+        self.max_ids = {}
+        self.clear()
+
+    def clear(self):
+        self.inserts = {cls: {} for cls in self.order}
+        self.updates = {}
+        self.links = {}
+        self.unlinks = {}
+        self.deletes = {}
+
+    def table_name(self, table):
+        # where a table's rows are written, for a subclass writing somewhere other than the table itself
+        return table
+
+    def next_id(self, cls):
+        table = cls.sqlmeta.table
+        if table not in self.max_ids:
+            self.max_ids[table] = self.connection.queryAll(f"SELECT MAX(id) FROM {table}")[0][0] or 0
+        self.max_ids[table] += 1
+        return self.max_ids[table]
+
+    def insert(self, cls, id=None, **values):
+        # given an id, the row has it rather than a new one
+        if id is None:
+            id = self.next_id(cls)
+        self.inserts.setdefault(cls, {})[id] = values
+        return id
+
+    def update(self, cls, id, **values):
+        if id in self.inserts.get(cls, {}):
+            self.inserts[cls][id].update(values)
+        else:
+            self.updates.setdefault((cls, id), {}).update(values)
+
+    def link(self, table, columns, row):
+        # join rows, as ordered sets
+        self.links.setdefault((table, tuple(columns)), {})[tuple(row)] = None
+
+    def unlink(self, table, columns, row):
+        self.unlinks.setdefault((table, tuple(columns)), {})[tuple(row)] = None
+
+    def delete(self, cls, ids):
+        self.deletes.setdefault(cls, set()).update(ids)
+
+    def _columns(self, cls, values):
+        # column names and SQL values, converted as SQLObject would for the row itself
+        state = SQLObjectState(cls, connection=self.connection)
+        return {cls.sqlmeta.columns[name].dbName: cls.sqlmeta.columns[name].from_python(value, state)
+                for name, value in values.items()}
+
+    def _insert_all(self, trans, table, columns, rows):
+        for start in range(0, len(rows), self.batch_size):
+            trans.query(trans.sqlrepr(Insert(self.table_name(table), template=columns,
+                                             valueList=rows[start:start + self.batch_size])))
+
+    def flush(self):
+        written = []
+        trans = self.connection.transaction()
+        try:
+            for cls, rows in self.inserts.items():
+                if len(rows) == 0:
+                    continue
+                # rows given the same columns go in together
+                by_columns = {}
+                for id, values in rows.items():
+                    columns = self._columns(cls, values)
+                    by_columns.setdefault(tuple(columns), []).append([id] + list(columns.values()))
+                for columns, valueList in by_columns.items():
+                    self._insert_all(trans, cls.sqlmeta.table, ['id'] + list(columns), valueList)
+                written.append((cls.sqlmeta.table, 'insert', len(rows)))
+            for (cls, id), values in self.updates.items():
+                trans.query(trans.sqlrepr(Update(self.table_name(cls.sqlmeta.table), self._columns(cls, values),
+                                                 where=SQLConstant('id') == id)))
+                written.append((cls.sqlmeta.table, 'update', 1))
+            for (table, columns), rows in self.unlinks.items():
+                for row in rows:
+                    where = AND(*[SQLConstant(column) == value for column, value in zip(columns, row)])
+                    trans.query(trans.sqlrepr(Delete(self.table_name(table), where=where)))
+                written.append((table, 'delete', len(rows)))
+            for (table, columns), rows in self.links.items():
+                self._insert_all(trans, table, list(columns), list(rows))
+                written.append((table, 'insert', len(rows)))
+            for cls, ids in self.deletes.items():
+                trans.query(trans.sqlrepr(
+                    Delete(self.table_name(cls.sqlmeta.table), where=IN(SQLConstant('id'), sorted(ids)))))
+                written.append((cls.sqlmeta.table, 'delete', len(ids)))
+            trans.commit(close=True)
+        except:
+            trans.rollback()
+            self.discard()
+            raise
+        for table, action, rows in written:
+            metrics.count('rows', rows, table=table, action=action)
+        self.clear()
+
+    def discard(self):
+        # the ids given out for rows that were never written will be given out again
+        self.clear()
+        self.max_ids = {}
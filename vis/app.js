@@ -76,8 +76,12 @@ app.get('/', function(req, res) {
 
 // Forward D2R paths
 const fullPath = function(req) { return urlparse.parse(req.originalUrl).path; };
-app.use(['/sparql', '/snorql/', '/dataset', '/all', '/directory/', '/resource/', '/page/'],
+app.use(['/snorql/', '/dataset', '/all', '/directory/', '/resource/', '/page/'],
         createProxyMiddleware('http://d2r:2020'));
+// except SPARQL queries, which the registries' snapshot store answers
+app.use('/sparql', createProxyMiddleware('http://sparql:8001'));
+// and full-text search to the registries' search service
+app.use('/search', createProxyMiddleware('http://search:8000'));
 
 // catch 404 and forward to error handler
 app.use(function(req, res, next) {
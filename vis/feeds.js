@@ -0,0 +1,98 @@
+/*
+   Copyright 2017-2021 Alex Tucker
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+ */
+
+// The JSON feeds registries/export_feeds.py writes after each refresh. Each feed's files are named after
+// their content hash, which is also the ETag, and manifest.json says which are current.
+
+const fs = require('fs');
+const path = require('path');
+
+const feedsDir = process.env.FEEDS_DIR || '/data/feeds';
+const suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'};
+const parsed = {};
+let manifest = {};
+let manifestModified = null;
+
+function current(name) {
+  // the manifest is read again whenever the export replaces it
+  try {
+    const manifestPath = path.join(feedsDir, 'manifest.json');
+    const modified = fs.statSync(manifestPath).mtimeMs;
+    if (modified !== manifestModified) {
+      manifest = JSON.parse(fs.readFileSync(manifestPath, 'utf8'));
+      manifestModified = modified;
+    }
+  } catch (err) {
+    manifest = {};
+    manifestModified = null;
+  }
+  return manifest[name];
+}
+
+// The feed's URL with its ETag as a version, for pages to fetch so that it can be cached for good.
+exports.url = function(name, url) {
+  const feed = current(name);
+  return feed === undefined ? url : url + '?v=' + feed.etag;
+};
+
+// The feed itself, for the server to use, or undefined if there isn't one yet.
+exports.load = function(name) {
+  const feed = current(name);
+  if (feed === undefined) {
+    return undefined;
+  }
+  if (parsed[name] === undefined || parsed[name].etag !== feed.etag) {
+    try {
+      parsed[name] = {
+        etag: feed.etag,
+        data: JSON.parse(fs.readFileSync(path.join(feedsDir, name + '.' + feed.etag + '.json'), 'utf8'))
+      };
+    } catch (err) {
+      return undefined;
+    }
+  }
+  return parsed[name].data;
+};
+
+// Serves the feed, compressed as the client prefers, or hands over to fallback if there isn't one yet.
+// Requests for the current version are cached for a year, others have to revalidate with the ETag.
+exports.serve = function(name, fallback) {
+  return function(req, res, next) {
+    const feed = current(name);
+    if (feed === undefined) {
+      return fallback(req, res, next);
+    }
+    const encoding = req.acceptsEncodings(feed.encodings.concat(['identity'])) || 'identity';
+    res.set({
+      'Content-Type': 'application/json; charset=utf-8',
+      'ETag': '"' + feed.etag + (encoding === 'identity' ? '' : '-' + encoding) + '"',
+      'Vary': 'Accept-Encoding',
+      'Cache-Control': req.query.v === feed.etag ? 'public, max-age=31536000, immutable' : 'no-cache'
+    });
+    if (encoding !== 'identity') {
+      res.set('Content-Encoding', encoding);
+    }
+    if (req.fresh) {
+      return res.status(304).end();
+    }
+    res.sendFile(path.join(feedsDir, name + '.' + feed.etag + '.json' + suffixes[encoding]),
+                 {etag: false, lastModified: false, cacheControl: false}, function(err) {
+      if (err) {
+        next(err);
+      }
+    });
+  };
+};
@@ -81,7 +81,7 @@ const links = [];
 const topics = d3.set();
 const contexts = d3.set();
 
-d3.json('datasets').then(function(datasets) {
+d3.json(feeds.datasets).then(function(datasets) {
   for (let dataset in datasets) {
     nodes.push({
       id: dataset,
@@ -99,7 +99,7 @@ d3.json('datasets').then(function(datasets) {
     contexts.add(datasets[dataset].context);
   }
 
-  d3.json('labels').then( function(labels) {
+  d3.json(feeds.labels).then( function(labels) {
     topics.each(function(topic) {
       nodes.push({
         id: topic,
@@ -18,21 +18,26 @@ var express = require('express');
 var router = express.Router();
 var datasets = require('../data/WDAfloopscrape.json');
 var labels = require('../data/labels.json');
+var feeds = require('../feeds');
 
 router.get('/', function(req, res, next) {
   if (req.originalUrl.slice(-1) != '/') {
     res.redirect(301, req.originalUrl + '/');
   } else {
-    res.render('ons', {title: 'Office for National Statistics datasets'});
+    res.render('ons', {title: 'Office for National Statistics datasets', feeds: JSON.stringify({
+      datasets: feeds.url('ons-datasets', 'datasets'),
+      labels: feeds.url('ons-labels', 'labels')
+    })});
   }
 });
 
-router.get('/datasets', function(req, res, next) {
+// the snapshot in data/ until the registries have exported a feed
+router.get('/datasets', feeds.serve('ons-datasets', function(req, res, next) {
   res.json(datasets);
-});
+}));
 
-router.get('/labels', function(req, res, next) {
+router.get('/labels', feeds.serve('ons-labels', function(req, res, next) {
   res.json(labels);
-});
+}));
 
 module.exports = router;
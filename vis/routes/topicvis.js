@@ -20,8 +20,45 @@ const fs = require('fs');
 const async = require('async');
 const sparql = require('sparql');
 const moment = require('moment');
+const feeds = require('../feeds');
+
+function renderGraph(res, organisations) {
+  const types = {'topic': {short: 'Topic'}};
+  Object.keys(organisations).forEach(function(org) {
+    types[org] = {short: organisations[org]};
+  });
+  res.render('gss', {config: JSON.stringify({
+    jsonUrl: feeds.url('gss-data', 'data.json'),
+    title: 'Government Statistical Service datasets',
+    "graph" : {
+      "linkDistance" : 100,
+      "charge"       : -400,
+      "height"       : 800,
+      "numColors"    : 12,
+      "labelPadding" : {
+        "left"   : 3,
+        "right"  : 3,
+        "top"    : 2,
+        "bottom" : 2
+      },
+      "labelMargin" : {
+        "left"   : 3,
+        "right"  : 3,
+        "top"    : 2,
+        "bottom" : 2
+      },
+      "ticksWithoutCollisions" : 50
+    },
+    types: types,
+    constraints: []
+  })});
+}
 
 router.get('/', function(req, res, next) {
+  const organisations = feeds.load('gss-organisations');
+  if (organisations !== undefined) {
+    return renderGraph(res, organisations);
+  }
   const client = new sparql.Client('http://d2r:2020/sparql');
   client.rows(`PREFIX ss: <https://ons.gov.uk/ns/solarsystem#>
 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
@@ -34,40 +71,16 @@ SELECT ?org ?label WHERE {
     if (error) {
       res.render('error', {message: 'Error running SPARQL', error: error[1]});
     } else {
-      const types = {'topic': {short: 'Topic'}};
+      const organisations = {};
       rows.forEach(function(row) {
-        types[row.org.value] = {short: row.label.value};
+        organisations[row.org.value] = row.label.value;
       });
-      res.render('gss', {config: JSON.stringify({
-        jsonUrl: 'data.json',
-        title: 'Government Statistical Service datasets',
-        "graph" : {
-          "linkDistance" : 100,
-          "charge"       : -400,
-          "height"       : 800,
-          "numColors"    : 12,
-          "labelPadding" : {
-            "left"   : 3,
-            "right"  : 3,
-            "top"    : 2,
-            "bottom" : 2
-          },
-          "labelMargin" : {
-            "left"   : 3,
-            "right"  : 3,
-            "top"    : 2,
-            "bottom" : 2
-          },
-          "ticksWithoutCollisions" : 50
-        },
-        types: types,
-        constraints: []
-      })});
+      renderGraph(res, organisations);
     }
   });
 });
 
-router.get('/data.json', function(req, res, next) {
+router.get('/data.json', feeds.serve('gss-data', function(req, res, next) {
   const client = new sparql.Client('http://d2r:2020/sparql');
   client.rows(`PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
 PREFIX ss: <https://ons.gov.uk/ns/solarsystem#>
@@ -114,7 +127,7 @@ SELECT DISTINCT * WHERE {
       });
     }
   });
-});
+}));
 
 router.get('/dataset', function(req, res, next) {
   const client = new sparql.Client('http://d2r:2020/sparql');